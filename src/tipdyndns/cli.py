@@ -1,4 +1,5 @@
 """tipdyndns/cli.py"""
+import os
 import logging
 
 import click
@@ -6,7 +7,6 @@ import rich
 
 import IPython
 from traitlets.config.loader import Config
-import pyfiglet
 import textwrap
 
 
@@ -14,6 +14,8 @@ import transip
 
 from . import config
 from . import main
+from . import server
+from . import verify
 from . import util
 
 
@@ -75,10 +77,68 @@ def current_ip(ctx):
 
 @cli.command()
 @click.option('--reset', default=False, is_flag=True)
+@click.option('--pipelined', default=False, is_flag=True,
+              help='Overlap IP lookup, database open and TransIP auth.')
 @click.pass_context
-def run(ctx, reset):
+def run(ctx, reset, pipelined):
     cfg = ctx.obj['cfg']
-    main.run(cfg, reset)
+
+    if pipelined:
+        main.run_pipelined(cfg, reset)
+    else:
+        main.run(cfg, reset)
+
+
+@cli.command()
+@click.option('-i', '--interval', default=300, show_default=True, help='Seconds between checks.')
+@click.option('--serve/--no-serve', default=False, show_default=True, help='Run the HTTP status endpoint.')
+@click.option('--bind', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8053, show_default=True)
+@click.pass_context
+def watch(ctx, interval, serve, bind, port):
+    """Keep checking the IP address and (optionally) serve its status."""
+    cfg = ctx.obj['cfg']
+    status_cache = None
+
+    if serve:
+        status_cache = server.StatusCache()
+        server.serve(status_cache, bind, port)
+
+    main.watch(cfg, interval, status_cache)
+
+
+@cli.command('verify')
+@click.option('--ip', 'ip_address', default=None, help='Expected address (default: last known IP).')
+@click.option('-n', '--nameserver', 'nameservers', multiple=True, help='Resolver to query (default: authoritative).')
+@click.option('-p', '--port', default=None, type=int, help='DNS port (default: verify.port or 53).')
+@click.option('-t', '--timeout', default=None, type=float, help='Seconds to wait (default: verify.timeout or 120).')
+@click.pass_context
+def verify_(ctx, ip_address, nameservers, port, timeout):
+    """Check that all hosts resolve to the current IP."""
+    cfg = ctx.obj['cfg']
+
+    if ip_address is None:
+        db = main.Database(cfg)
+        ip_address = main.get_last_ip(db)
+        db.close()
+
+    if not ip_address:
+        raise click.UsageError("No known IP address in the history; use --ip.")
+
+    overrides = {}
+    if nameservers:
+        overrides['nameservers'] = list(nameservers)
+    if port is not None:
+        overrides['port'] = port
+    if timeout is not None:
+        overrides['timeout'] = timeout
+
+    results = verify.verify_propagation(cfg, cfg.settings.hosts, ip_address, **overrides)
+
+    for host, per_ns in results.items():
+        for nameserver, seconds in per_ns.items():
+            status = 'timeout' if seconds is None else f'{seconds:.1f}s'
+            rich.print(f"{host} @ {nameserver}: {status}")
 
 
 @cli.command()
@@ -86,9 +146,9 @@ def run(ctx, reset):
 @click.pass_context
 def check(ctx, domain):
     cfg = ctx.obj['cfg']
-    client = main.get_transip_client(cfg)
+    provider = main.get_provider(cfg)
 
-    main.list_dns_entries_for_domain(client, domain)
+    main.list_dns_entries_for_domain(provider, domain)
 
 
 @cli.command()
@@ -104,29 +164,65 @@ def show_history(ctx):
 # ------------------------------------------------------------------------------
 # shell
 # ------------------------------------------------------------------------------
+def get_banner(cfg):
+    """Return the shell banner, rendering it with pyfiglet only once."""
+    filename = os.path.join(cfg.cache_dir, 'banner.txt')
+
+    try:
+        with open(filename) as fp:
+            return fp.read()
+    except OSError:
+        pass
+
+    import pyfiglet
+    banner = pyfiglet.figlet_format('tipdyndns', font="graffiti")
+
+    try:
+        os.makedirs(cfg.cache_dir, exist_ok=True)
+        with open(filename, 'w') as fp:
+            fp.write(banner)
+    except OSError:
+        pass
+
+    return banner
+
 @cli.command()
 @click.option('--online/--offline', default=True, is_flag=True)
+@click.option('--banner/--no-banner', default=True, is_flag=True)
 @click.pass_context
-def shell(ctx, online):
-    """Run a shell."""
+def shell(ctx, online, banner):
+    """Run a shell.
+
+    `tip` and `db` are only created when first used; `db` is a snapshot of
+    the database, so the shell doesn't block concurrent runs. With --offline
+    `tip` isn't available at all.
+    """
     # Retrieve configuration from context
     cfg = ctx.obj['cfg']
 
-    # Namespace for the shell
-    namespace = {
-        'main': main,
-        'cfg': cfg,
-        'tip': main.get_transip_client(cfg),
-        'db': main.Database(cfg),
+    factories = {
+        'db': lambda: main.Database(cfg, snapshot=True),
     }
 
+    if online:
+        factories['tip'] = lambda: main.get_transip_client(cfg)
+
+    # Namespace for the shell
+    namespace = util.LazyNamespace(
+        {
+            'main': main,
+            'cfg': cfg,
+        },
+        factories=factories,
+    )
+
 
     line = ''
-    banner1 = line + pyfiglet.figlet_format('tipdyndns', font="graffiti")
+    banner1 = line + get_banner(cfg) if banner else ''
     banner2 = textwrap.dedent(f"""
 
     The following variables/modules are available:
-        {[n for n in namespace.keys()]}
+        {namespace.names()}
 
     """)
 
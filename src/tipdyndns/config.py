@@ -2,17 +2,22 @@
 from typing import List, Any
 
 import os
+import hashlib
 import logging
 
 # from sqlalchemy.engine.url import make_url
 
 
 import munch
-import benedict
 import json
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 from rich import print as rprint
 
@@ -23,9 +28,11 @@ from appdirs import (
     user_log_dir,
     user_data_dir,
     site_data_dir,
+    user_cache_dir,
 )
 
 FILENAME = 'config.yaml'
+CACHE_FILENAME = 'config-{}.json'
 
 DEFAULT_SETTINGS = {
     # 'description': "tipdyndns's defaults",
@@ -39,6 +46,13 @@ DEFAULT_SETTINGS = {
         # format for logfile. this does not affect console.
         'format': '%(asctime)s - %(name)-14s - %(levelname)-8s - %(message)s',
         'datefmt': '%d-%m-%Y %H:%M:%S',
+        # write to file/console from a background thread
+        'use_queue': False,
+        # write JSON lines to the logfile
+        'use_json': False,
+        # only log every n-th repetition of messages at or below sample_level
+        'sample_rate': 1,
+        'sample_level': 'INFO',
     },
     # 'database': {
     #     'username': None,
@@ -61,6 +75,19 @@ class ConfigNotFoundError(Exception):
 
 
 
+def deep_merge(base: dict, other: dict) -> dict:
+    """Return a copy of `base`, recursively updated with `other`."""
+    merged = dict(base)
+
+    for key, value in other.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+
+    return merged
+
+
 class Configuration(object):
     """..."""
 
@@ -100,6 +127,10 @@ class Configuration(object):
 
         return site_data_dir(self.app, self.author)
 
+    @property
+    def cache_dir(self):
+        return user_cache_dir(self.app, self.author)
+
     # @property
     # def database_URI(self):
     #     """Return `self.settings.database.uri` as URI."""
@@ -159,19 +190,85 @@ class Configuration(object):
         log = logging.getLogger('config')
         log.info(f'Loading configuration from "{filename}"')
 
-        with open(filename) as fp:
-            config = yaml.load(fp.read(), Loader=yaml.SafeLoader)
+        config = self._read(filename)
 
         # Do a deep-merge of the current and read configuration.
-        # For some reason Munch.fromDict chokes on benedict,
-        # so we'll jump through a few hoops.
-        current = self.settings.toDict()
-        bcurrent = benedict.benedict(current)
-        bcurrent.merge(config, overwrite=True)
-        merged = json.loads(bcurrent.to_json())
+        merged = deep_merge(self.settings.toDict(), config or {})
         self.settings = munch.Munch.fromDict(merged)
         self.filename = filename
 
+    def cache_file(self, filename: str) -> str:
+        """Return the cache file for configuration file `filename`.
+
+        Every configuration file gets its own cache, so switching between
+        them doesn't invalidate it.
+        """
+        digest = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+        return os.path.join(self.cache_dir, CACHE_FILENAME.format(digest[:12]))
+
+    def _read(self, filename: str) -> dict:
+        """Parse a configuration file, using the on-disk cache if possible.
+
+        The cache is keyed by the file's absolute path, mtime and size, so
+        the YAML is only parsed again when the file has changed. It is plain
+        JSON, readable by the current user only: like the configuration
+        itself, it contains the TransIP private key.
+        """
+        log = logging.getLogger('config')
+
+        stat = os.stat(filename)
+        key = [os.path.abspath(filename), stat.st_mtime_ns, stat.st_size]
+        cache_file = self.cache_file(filename)
+
+        try:
+            with open(cache_file) as fp:
+                cached = json.load(fp)
+
+            if cached['key'] == key:
+                log.debug(f'Using cached configuration from "{cache_file}"')
+                return cached['config']
+
+        except FileNotFoundError:
+            pass
+
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.debug(f'Ignoring configuration cache: {e}')
+
+        with open(filename, 'rb') as fp:
+            config = yaml.load(fp, Loader=SafeLoader)
+
+        self._write_cache(cache_file, key, config)
+        return config
+
+    def _write_cache(self, cache_file: str, key: list, config: dict):
+        """Atomically write the cache file with mode 0600."""
+        log = logging.getLogger('config')
+
+        try:
+            data = json.dumps({'key': key, 'config': config})
+        except (TypeError, ValueError) as e:
+            log.debug(f'Not caching configuration: {e}')
+            return
+
+        # Only cache what survives the round trip (e.g. no dates or int keys).
+        if json.loads(data)['config'] != config:
+            log.debug('Not caching configuration: not JSON compatible')
+            return
+
+        tmp_file = f'{cache_file}.{os.getpid()}'
+
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(data)
+
+            os.replace(tmp_file, cache_file)
+
+        except OSError as e:
+            log.debug(f'Could not write configuration cache: {e}')
+
     def save(self, filename: str = None):
         """Save configuration to disk."""
         filename = filename or self.filename
@@ -1,22 +1,40 @@
 """Main functionality."""
 from typing import List
 import os
+import shutil
+import tempfile
 import logging
+import time
 from requests import get
 from datetime import datetime
+import threading
+from concurrent.futures import Future
 
 import duckdb
-from transip import TransIP
 
 from . import util
+from . import verify
+from . import ttl
+from .providers import Record, TransIPProvider, get_provider
 
 log = logging.getLogger('tipdyndns')
 
 
 class Database(object):
 
-    def __init__(self, cfg, reset=False):
+    def __init__(self, cfg, reset=False, snapshot=False):
+        """Open (and if needed initialize) the database.
+
+        With `snapshot`, a private copy of the database file is opened
+        instead, so no lock is held on the real file and concurrent runs
+        aren't blocked. Changes to a snapshot are discarded.
+        """
         filename = os.path.join(cfg.data_dir, cfg.settings.database)
+        self._snapshot_dir = None
+
+        if snapshot:
+            filename = self._make_snapshot(filename)
+
         conn = duckdb.connect(filename)
 
         try:
@@ -25,14 +43,91 @@ class Database(object):
         except duckdb.CatalogException:
             pass
 
+        try:
+            conn.sql("CREATE TABLE propagation (host VARCHAR, nameserver VARCHAR, ip VARCHAR, converged_s DOUBLE, checked_dt DATETIME)")
+        except duckdb.CatalogException:
+            pass
+
+        try:
+            conn.sql("CREATE TABLE record_ttl (host VARCHAR, expire INTEGER, updated_dt DATETIME)")
+        except duckdb.CatalogException:
+            pass
+
         if reset:
             conn.sql("DELETE FROM ip_history")
 
         self.conn = conn
 
+    def _make_snapshot(self, filename):
+        """Copy `filename` (and its WAL) to a temporary directory."""
+        if not os.path.exists(filename):
+            return ':memory:'
+
+        self._snapshot_dir = tempfile.TemporaryDirectory(prefix='tipdyndns-')
+        copy = os.path.join(self._snapshot_dir.name, os.path.basename(filename))
+
+        for suffix in ('', '.wal'):
+            if os.path.exists(filename + suffix):
+                shutil.copyfile(filename + suffix, copy + suffix)
+
+        return copy
+
+    def close(self):
+        self.conn.close()
+
+        if self._snapshot_dir is not None:
+            self._snapshot_dir.cleanup()
+
     def get_entries(self):
         return self.conn.sql("select * from ip_history").fetchall()
 
+    def get_history(self, limit=10):
+        """Return the `limit` most recent (ip, assigned_dt) tuples."""
+        return self.conn.sql(f"""
+            select
+                ip,
+                assigned_dt
+            from
+                ip_history
+            order by
+                assigned_dt desc
+            limit {int(limit)}
+        """).fetchall()
+
+    def add_propagation(self, host, nameserver, ip_address, converged_s, checked_at=None):
+        if checked_at is None:
+            checked_at = datetime.now()
+
+        self.conn.execute(
+            "insert into propagation values (?, ?, ?, ?, ?)",
+            [host, nameserver, ip_address, converged_s, checked_at],
+        )
+
+    def get_change_times(self):
+        """Return the moments the IP changed, oldest first."""
+        rows = self.conn.sql("select assigned_dt from ip_history order by assigned_dt").fetchall()
+        return [r[0] for r in rows]
+
+    def get_ttl(self, host):
+        """Return the TTL last written for `host` (or None)."""
+        row = self.conn.execute("""
+            select expire from record_ttl
+            where host = ?
+            order by updated_dt desc
+            limit 1
+        """, [host]).fetchone()
+
+        return row[0] if row else None
+
+    def set_ttl(self, host, expire, updated_at=None):
+        if updated_at is None:
+            updated_at = datetime.now()
+
+        self.conn.execute(
+            "insert into record_ttl values (?, ?, ?)",
+            [host, expire, updated_at],
+        )
+
     def get_latest_entry(self):
 
         return self.conn.sql("""
@@ -63,28 +158,207 @@ class Database(object):
         """)
 
 
-def create_or_update_host_record(transip_client, host, current_ip, expire):
-    """Create or update a host record at TransIP."""
+def get_last_ip(db) -> str:
+    """Return the last known IP from the history (or '' if there is none)."""
+    latest_entry = db.get_latest_entry()
+
+    try:
+        last_ip = latest_entry[0]
+    except:
+        last_ip = ''
 
-    # First get the currenct record.
-    log.info(f"Checking '{host}'")
-    hostname, domain = host.split('.', 1)
-    dns_entry = get_dns_entry_by_name(transip_client, domain, hostname)
+    return last_ip
 
-    if dns_entry is None:
-        log.info("Creating new DNS entry!")
-        create_dns_entry(
-            transip_client,
-            domain,
-            hostname,
-            expire,
-            'A',
-            current_ip,
-        )
+def hosts_by_domain(hosts) -> dict:
+    """Group 'name.domain' hosts as {domain: [name, ...]}."""
+    grouped = {}
 
-    else:
-        log.info("Updating DNS entry!")
-        update_dns_entry(transip_client, domain, dns_entry, current_ip)
+    for host in hosts:
+        name, domain = host.split('.', 1)
+        grouped.setdefault(domain, []).append(name)
+
+    return grouped
+
+def find_a_record(records, name):
+    for record in records:
+        if record.name == name and record.type == 'A':
+            return record
+
+def update_hosts(provider, cfg, current_ip, expire=None) -> dict:
+    """Point all configured hosts at `current_ip`.
+
+    New records get `expire` (default: `cfg.settings.expire`); existing
+    records keep their TTL unless `expire` is given. The records of each
+    domain are listed once and written with the cheapest operation the
+    provider supports.
+
+    Returns a dict with the resulting record state per host.
+    """
+    states = {}
+
+    for domain, names in hosts_by_domain(cfg.settings.hosts).items():
+        existing = provider.list(domain)
+        creates, updates = [], []
+
+        for name in names:
+            host = f'{name}.{domain}'
+            log.info(f"Updating '{host}'")
+            record = find_a_record(existing, name)
+
+            if record is None:
+                # Create new entry
+                log.info("Creating new DNS entry!")
+                record = Record(name, expire or cfg.settings.expire, 'A', current_ip)
+                creates.append(record)
+                action = 'created'
+            else:
+                log.info("Updating DNS entry!")
+                record = record._replace(content=current_ip, expire=expire or record.expire)
+                updates.append(record)
+                action = 'updated'
+
+            states[host] = {
+                'content': current_ip,
+                'expire': record.expire,
+                'action': action,
+                'updated_dt': datetime.now().isoformat(),
+            }
+
+        provider.apply(domain, existing, creates, updates)
+
+    return states
+
+def get_host_states(provider, cfg) -> dict:
+    """Return the current record state per host as known at the provider."""
+    states = {}
+
+    for domain, names in hosts_by_domain(cfg.settings.hosts).items():
+        existing = provider.list(domain)
+
+        for name in names:
+            host = f'{name}.{domain}'
+            record = find_a_record(existing, name)
+
+            if record is None:
+                states[host] = {'content': None, 'action': 'missing'}
+            else:
+                states[host] = {
+                    'content': record.content,
+                    'expire': record.expire,
+                    'action': 'unchanged',
+                }
+
+    return states
+
+def verify_and_record(cfg, current_ip):
+    """Verify propagation of `current_ip` (if enabled) and store the timings.
+
+    Verification can take up to `verify.timeout` seconds, so the database is
+    only opened afterwards, to store the results.
+    """
+    if not verify.get_verify_settings(cfg)['enabled']:
+        return None
+
+    try:
+        results = verify.verify_propagation(cfg, cfg.settings.hosts, current_ip)
+    except Exception as e:
+        log.warning(f"Could not verify propagation: {e}")
+        return None
+
+    db = Database(cfg)
+
+    try:
+        for host, per_ns in results.items():
+            for nameserver, seconds in per_ns.items():
+                if seconds is None:
+                    log.warning(f"'{host}' did not converge on {nameserver}")
+                else:
+                    log.info(f"'{host}' converged on {nameserver} after {seconds:.1f}s")
+
+                db.add_propagation(host, nameserver, current_ip, seconds)
+    finally:
+        db.close()
+
+    return results
+
+def apply_change(cfg, db, provider, current_ip) -> dict:
+    """Update all hosts to `current_ip` and record the change."""
+    ttl_settings = ttl.get_ttl_settings(cfg)
+
+    # Right after a change the TTL is kept low: another change may follow.
+    expire = ttl_settings['min'] if ttl_settings['adaptive'] else None
+
+    hosts = update_hosts(provider, cfg, current_ip, expire)
+
+    # All done updating the provider
+    log.debug("Updating IP History")
+
+    # Add the new IP to history
+    db.add_entry(current_ip)
+
+    if ttl_settings['adaptive']:
+        for host in hosts:
+            db.set_ttl(host, expire)
+
+    return hosts
+
+def adjust_ttl(cfg, db, provider_factory) -> dict:
+    """Move the TTL of all hosts towards the adaptive target (if enabled).
+
+    `provider_factory` is only called when at least one record needs a new TTL.
+
+    Returns a dict with the resulting record state per changed host.
+    """
+    ttl_settings = ttl.get_ttl_settings(cfg)
+    states = {}
+
+    if not ttl_settings['adaptive']:
+        return states
+
+    target = ttl.target_ttl(ttl_settings, db.get_change_times())
+    provider = None
+
+    for domain, names in hosts_by_domain(cfg.settings.hosts).items():
+        names = [
+            name for name in names
+            if ttl.crosses_threshold(
+                ttl_settings,
+                db.get_ttl(f'{name}.{domain}') or cfg.settings.expire,
+                target
+            )
+        ]
+
+        if not names:
+            continue
+
+        if provider is None:
+            provider = provider_factory()
+
+        existing = provider.list(domain)
+        updates = []
+
+        for name in names:
+            record = find_a_record(existing, name)
+
+            if record is None:
+                continue
+
+            log.info(f"Changing TTL of '{name}.{domain}' from {record.expire} to {target}")
+            updates.append(record._replace(expire=target))
+
+        provider.apply(domain, existing, [], updates)
+
+        for record in updates:
+            host = f'{record.name}.{domain}'
+            db.set_ttl(host, target)
+            states[host] = {
+                'content': record.content,
+                'expire': target,
+                'action': 'ttl',
+                'updated_dt': datetime.now().isoformat(),
+            }
+
+    return states
 
 def run(cfg, reset):
     """Check the current (external) IP address and update the DNS server"""
@@ -97,12 +371,7 @@ def run(cfg, reset):
     db = Database(cfg, reset)
 
     # Get the last known IP from config
-    latest_entry = db.get_latest_entry()
-
-    try:
-        last_ip = latest_entry[0]
-    except:
-        last_ip = ''
+    last_ip = get_last_ip(db)
 
     log.debug(f"Last known IP: '{last_ip}'")
 
@@ -110,93 +379,155 @@ def run(cfg, reset):
     if current_ip != last_ip:
         log.info(f"IP address has changed!")
 
-        # Update TransIP hosts ...
-        client = get_transip_client(cfg)
+        # Update DNS hosts ...
+        provider = get_provider(cfg)
+        apply_change(cfg, db, provider, current_ip)
+        db.close()
 
-        for host in cfg.settings.hosts:
-            log.info(f"Updating '{host}'")
-            name, domain = host.split('.', 1)
-            dns_entry = get_dns_entry_by_name(client, domain, name)
+        verify_and_record(cfg, current_ip)
 
-            if dns_entry is None:
-                # Create new entry
-                log.info("Creating new DNS entry!")
+    else:
+        adjust_ttl(cfg, db, lambda: get_provider(cfg))
 
-                create_dns_entry(
-                    client,
-                    domain,
-                    name,
-                    cfg.settings.expire,
-                    'A',
-                    current_ip,
-                )
-            else:
-                log.info("Updating DNS entry!")
-                update_dns_entry(client, domain, dns_entry, current_ip)
+def submit_daemon(fn, *args) -> Future:
+    """Run `fn(*args)` on a daemon thread and return a Future for its result.
 
-        # All done updating TransIP
-        log.debug("Updating IP History")
+    Unlike ThreadPoolExecutor's workers, these threads are not joined when
+    the interpreter exits, so abandoned work doesn't delay shutdown.
+    """
+    future = Future()
 
-        # Add the new IP to history
-        db.add_entry(current_ip)
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
 
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name=f'tipdyndns-{fn.__name__}', daemon=True).start()
+    return future
+
+def run_pipelined(cfg, reset):
+    """Like `run`, but overlap the slow startup steps.
+
+    The external IP lookup, opening the database and creating the DNS
+    provider (for TransIP this authenticates) are started at the same time.
+    The provider is speculative: if the IP turns out to be unchanged, it is
+    simply abandoned. It runs on a daemon thread, so neither this function
+    nor the process waits for it (the auth request itself may still go out).
+    """
+    f_ip = submit_daemon(get_current_ip, cfg)
+    f_db = submit_daemon(Database, cfg, reset)
+    f_provider = submit_daemon(get_provider, cfg)
+
+    current_ip = f_ip.result()
+    log.debug(f"Current IP: '{current_ip}'")
+
+    db = f_db.result()
+    last_ip = get_last_ip(db)
+    log.debug(f"Last known IP: '{last_ip}'")
+
+    if current_ip == last_ip:
+        adjust_ttl(cfg, db, f_provider.result)
+
+        if not f_provider.done():
+            log.debug("Abandoning speculative DNS provider")
+        return
+
+    log.info(f"IP address has changed!")
+
+    # Update DNS hosts ...
+    provider = f_provider.result()
+    apply_change(cfg, db, provider, current_ip)
+    db.close()
+
+    verify_and_record(cfg, current_ip)
+
+def watch(cfg, interval=300, status_cache=None, history_size=10):
+    """Keep checking the external IP every `interval` seconds.
+
+    If a `server.StatusCache` is provided it is kept up to date with the last
+    detected IP, the time of the last change, per-host record state and the
+    recent history.
+
+    The database is opened for each check only, so other commands can use
+    it in between.
+    """
+    if status_cache is not None:
+        db = Database(cfg)
+        try:
+            history = db.get_history(history_size)
+            last_ip = get_last_ip(db)
+        finally:
+            db.close()
+
+        changed_dt = history[0][1] if history else None
+        status_cache.update(
+            ip=last_ip or None,
+            changed_dt=changed_dt,
+            history=history,
+        )
+
+        try:
+            status_cache.update(hosts=get_host_states(get_provider(cfg), cfg))
+        except Exception as e:
+            log.warning(f"Could not retrieve current host records: {e}")
+
+    while True:
+        try:
+            current_ip = get_current_ip(cfg)
+            changed = False
+            db = Database(cfg)
+
+            try:
+                last_ip = get_last_ip(db)
+
+                if current_ip == last_ip:
+                    log.debug(f"IP unchanged: '{current_ip}'")
+                    hosts = adjust_ttl(cfg, db, lambda: get_provider(cfg))
+
+                    if hosts and status_cache is not None:
+                        status_cache.update(hosts=hosts)
+
+                else:
+                    log.info(f"IP address has changed: '{last_ip}' -> '{current_ip}'")
+                    provider = get_provider(cfg)
+                    hosts = apply_change(cfg, db, provider, current_ip)
+                    changed = True
+
+                    if status_cache is not None:
+                        history = db.get_history(history_size)
+                        status_cache.update(
+                            ip=current_ip,
+                            changed_dt=history[0][1],
+                            hosts=hosts,
+                            history=history,
+                        )
+
+            finally:
+                db.close()
+
+            # The cache is already up to date while we wait for propagation.
+            if changed:
+                verify_and_record(cfg, current_ip)
+
+        except Exception as e:
+            log.exception(f"Check failed: {e}")
+
+        time.sleep(interval)
 
 
 def get_current_ip(cfg) -> str:
     """Return the current (external) IP address."""
     return get('https://api.ipify.org').text
 
-def get_transip_client(cfg) -> TransIP:
+def get_transip_client(cfg):
     """Create a TransIP Client."""
-    client = TransIP(
-        login=cfg.settings.transip.username,
-        private_key=cfg.settings.transip.privkey,
-        global_key=True
-    )
+    return TransIPProvider.from_config(cfg).client
 
-    return client
-
-def list_dns_entries_for_domain(client, domain):
+def list_dns_entries_for_domain(provider, domain):
     """Print all entries for a domain to the console."""
-    # Retrieve a domain by its name.
-    d = client.domains.get(domain)
-
-    # Retrieve the DNS records of a single domain.
-    records = d.dns.list()
-
-    # Show the DNS record information on the screen.
-    for record in records:
+    for record in provider.list(domain):
         print(f"DNS: {record.name} {record.expire} {record.type} {record.content}")
-
-def create_dns_entry(
-    client: TransIP, domain: str, name: str, exp: int,
-    type_: str, content: str
-):
-    d = client.domains.get(domain)
-    d.dns.create({
-        'name': name,
-        'expire': exp,
-        'type': type_,
-        'content': content,
-    })
-
-def update_dns_entry(client, domain, entry, content):
-    d = client.domains.get(domain)
-    d.dns.update({
-        'name': entry.name,
-        'expire': entry.expire,
-        'type': entry.type,
-        'content': content,
-    })
-
-def get_dns_entry_by_name(client: TransIP, domain: str, name: str):
-    # Retrieve a domain by its name.
-    d = client.domains.get(domain)
-
-    # Retrieve the DNS records of a single domain.
-    records = d.dns.list()
-
-    # Show the DNS record information on the screen.
-    for record in records:
-        if record.name == name  and record.type == 'A':
-            return record
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""DNS provider backends.
+
+A provider knows how to list, create, update and delete the records of a
+domain. Capability flags tell `Provider.apply` which cheaper operations
+(batched updates, replacing all records at once) a backend supports.
+"""
+from typing import List
+import abc
+import time
+import logging
+from collections import namedtuple, Counter
+
+log = logging.getLogger('tipdyndns')
+
+Record = namedtuple('Record', ['name', 'expire', 'type', 'content'])
+
+
+class Provider(abc.ABC):
+    """Base class for DNS providers."""
+
+    # Several records can be updated in a single call (`update_many`).
+    supports_batch = False
+
+    # All records of a domain can be replaced in a single call.
+    supports_bulk_replace = False
+
+    # `update` can change the TTL (not only the content) of a record. If not,
+    # TTL changes are done by creating the new record and deleting the old.
+    updates_expire = True
+
+    # Replacing all records of a domain also rewrites records we don't
+    # manage (MX, TXT, ...), so it is only used when explicitly allowed.
+    allow_replace = False
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Create a provider from the `provider` section of the settings."""
+        return cls()
+
+    @abc.abstractmethod
+    def list(self, domain: str) -> List[Record]:
+        """Return all records of `domain`."""
+
+    @abc.abstractmethod
+    def create(self, domain: str, record: Record):
+        """Add `record` to `domain`."""
+
+    @abc.abstractmethod
+    def update(self, domain: str, record: Record):
+        """Update the record with the same name and type as `record`."""
+
+    @abc.abstractmethod
+    def delete(self, domain: str, record: Record):
+        """Remove `record` from `domain`."""
+
+    @abc.abstractmethod
+    def replace_all(self, domain: str, records: List[Record]):
+        """Replace all records of `domain` by `records`.
+
+        Only called if `supports_bulk_replace` and `allow_replace` are set.
+        """
+
+    def update_many(self, domain: str, records: List[Record]):
+        for record in records:
+            self.update(domain, record)
+
+    def apply(self, domain: str, existing: List[Record], creates: List[Record], updates: List[Record]):
+        """Write `creates` and `updates` using the cheapest supported operation.
+
+        `existing` are the records as returned by `list(domain)`; updates are
+        matched to them by name and type. Content changes always go through
+        (batched) per-record updates. TTL changes the provider can't do in
+        place are done by creating the new record and deleting the old one,
+        or, if allowed, by replacing all records of the domain at once.
+        """
+        old = {(r.name, r.type): r for r in existing}
+
+        # Records whose TTL can't be changed in place.
+        moves = []
+        if not self.updates_expire:
+            moves = [
+                r for r in updates
+                if (r.name, r.type) in old and old[(r.name, r.type)].expire != r.expire
+            ]
+            updates = [r for r in updates if r not in moves]
+
+        if moves and self.supports_bulk_replace and self.allow_replace:
+            changed = {(r.name, r.type): r for r in updates + moves}
+            records = [changed.get((r.name, r.type), r) for r in existing]
+            log.debug(f"Replacing all {len(records) + len(creates)} records of '{domain}'")
+            self.replace_all(domain, records + list(creates))
+            return
+
+        for record in moves:
+            # Create first, so the name keeps resolving in between.
+            self.create(domain, record)
+            self.delete(domain, old[(record.name, record.type)])
+
+        for record in creates:
+            self.create(domain, record)
+
+        if len(updates) > 1 and self.supports_batch:
+            self.update_many(domain, updates)
+        else:
+            for record in updates:
+                self.update(domain, record)
+
+
+class TransIPProvider(Provider):
+    """Records at TransIP (https://www.transip.nl)."""
+
+    supports_bulk_replace = True
+
+    # TransIP identifies the entry to update by name, expire and type.
+    updates_expire = False
+
+    def __init__(self, client, allow_replace=False):
+        self.client = client
+        self.allow_replace = allow_replace
+
+    @classmethod
+    def from_config(cls, cfg):
+        from transip import TransIP
+
+        settings = cfg.settings.get('provider', None) or {}
+
+        client = TransIP(
+            login=cfg.settings.transip.username,
+            private_key=cfg.settings.transip.privkey,
+            global_key=True
+        )
+
+        return cls(client, allow_replace=settings.get('allow_replace', False))
+
+    def _dns(self, domain):
+        return self.client.domains.get(domain).dns
+
+    def list(self, domain):
+        return [
+            Record(r.name, r.expire, r.type, r.content)
+            for r in self._dns(domain).list()
+        ]
+
+    def create(self, domain, record):
+        self._dns(domain).create(record._asdict())
+
+    def update(self, domain, record):
+        self._dns(domain).update(record._asdict())
+
+    def delete(self, domain, record):
+        self._dns(domain).delete(record._asdict())
+
+    def replace_all(self, domain, records):
+        # DnsEntryService.replace() reads the entries from API objects (their
+        # _updated_attrs), not from dicts, so send plain entries ourselves.
+        self.client.put(
+            f'/domains/{domain}/dns',
+            json={'dnsEntries': [r._asdict() for r in records]}
+        )
+
+
+class MemoryProvider(Provider):
+    """In-memory records, for testing and benchmarks.
+
+    Every call sleeps `latency` seconds and is counted in `calls`.
+
+    `from_config` returns one instance per process, so repeated checks (e.g.
+    in `watch`) see the records written earlier. It is seeded from
+    `provider.records`: {domain: [{name, expire, type, content}, ...]}.
+    """
+
+    # Instance shared by from_config.
+    shared = None
+
+    def __init__(self, latency=0.0, supports_batch=True, supports_bulk_replace=True,
+                 updates_expire=True, allow_replace=False):
+        self.latency = latency
+        self.allow_replace = allow_replace
+        self.supports_batch = supports_batch
+        self.supports_bulk_replace = supports_bulk_replace
+        self.updates_expire = updates_expire
+        self.domains = {}
+        self.calls = Counter()
+
+    @classmethod
+    def from_config(cls, cfg):
+        if cls.shared is not None:
+            return cls.shared
+
+        settings = cfg.settings.get('provider', None) or {}
+
+        provider = cls(
+            latency=settings.get('latency', 0.0),
+            supports_batch=settings.get('supports_batch', True),
+            supports_bulk_replace=settings.get('supports_bulk_replace', True),
+            updates_expire=settings.get('updates_expire', True),
+            allow_replace=settings.get('allow_replace', False),
+        )
+
+        for domain, records in (settings.get('records', None) or {}).items():
+            provider.domains[domain] = [Record(**r) for r in records]
+
+        cls.shared = provider
+        return provider
+
+    def _call(self, operation):
+        self.calls[operation] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _find(self, domain, record):
+        for idx, r in enumerate(self.domains.get(domain, [])):
+            if r.name == record.name and r.type == record.type:
+                return idx
+
+        raise KeyError(f"No {record.type} record '{record.name}' in '{domain}'")
+
+    def list(self, domain):
+        self._call('list')
+        return list(self.domains.get(domain, []))
+
+    def create(self, domain, record):
+        self._call('create')
+        self.domains.setdefault(domain, []).append(record)
+
+    def update(self, domain, record):
+        self._call('update')
+        self.domains[domain][self._find(domain, record)] = record
+
+    def delete(self, domain, record):
+        self._call('delete')
+        self.domains[domain].remove(record)
+
+    def update_many(self, domain, records):
+        self._call('update_many')
+        for record in records:
+            self.domains[domain][self._find(domain, record)] = record
+
+    def replace_all(self, domain, records):
+        self._call('replace_all')
+        self.domains[domain] = list(records)
+
+
+PROVIDERS = {
+    'transip': TransIPProvider,
+    'memory': MemoryProvider,
+}
+
+
+def get_provider(cfg) -> Provider:
+    """Create the provider configured under `provider.name` (default: transip)."""
+    settings = cfg.settings.get('provider', None) or {}
+    name = settings.get('name', 'transip')
+
+    try:
+        cls = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown DNS provider '{name}'")
+
+    return cls.from_config(cfg)
@@ -0,0 +1,145 @@
+"""Lightweight HTTP status endpoint.
+
+Serves the last detected IP, per-host record state and recent history from an
+in-memory cache that is kept up to date by `main.watch`.
+"""
+import json
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger('tipdyndns')
+
+
+def _isoformat(dt):
+    if dt is None:
+        return None
+
+    return dt.isoformat()
+
+
+class StatusCache(object):
+    """Thread-safe, in-memory snapshot of the current state.
+
+    The JSON document and its ETag are rendered once on every change so
+    request handlers only have to compare strings and write bytes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ip = None
+        self.changed_dt = None
+        self.hosts = {}
+        self.history = []
+        self._render()
+
+    def update(self, ip=None, changed_dt=None, hosts=None, history=None):
+        """Update (part of) the cache."""
+        with self._lock:
+            if ip is not None:
+                self.ip = ip
+
+            if changed_dt is not None:
+                self.changed_dt = changed_dt
+
+            if hosts is not None:
+                self.hosts.update(hosts)
+
+            if history is not None:
+                self.history = list(history)
+
+            self._render()
+
+    def get(self, resource: str):
+        """Return (body, etag, content_type) for `resource` or None."""
+        with self._lock:
+            return self._rendered.get(resource)
+
+    def _render(self):
+        status = {
+            'ip': self.ip,
+            'changed_dt': _isoformat(self.changed_dt),
+            'hosts': self.hosts,
+            'history': [
+                {'ip': ip, 'assigned_dt': _isoformat(dt)}
+                for ip, dt in self.history
+            ],
+        }
+        status = json.dumps(status, default=str).encode()
+        ip = (self.ip or '').encode()
+
+        self._rendered = {
+            '/status': (status, self._etag(status), 'application/json'),
+            '/ip': (ip, self._etag(ip), 'text/plain; charset=utf-8'),
+        }
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Serve the contents of a `StatusCache` (set on the server)."""
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body):
+        path = self.path.split('?', 1)[0].rstrip('/') or '/status'
+        entry = self.server.cache.get(path)
+
+        if entry is None:
+            self.send_error(404)
+            return
+
+        body, etag, content_type = entry
+
+        if self._etag_matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        if include_body:
+            self.wfile.write(body)
+
+    def _etag_matches(self, etag) -> bool:
+        header = self.headers.get('If-None-Match')
+
+        if not header:
+            return False
+
+        candidates = [c.strip() for c in header.split(',')]
+        return '*' in candidates or etag in candidates \
+            or f'W/{etag}' in candidates
+
+    def log_message(self, format, *args):
+        log.debug(f"status: {self.address_string()} - {format % args}")
+
+
+def serve(cache: StatusCache, host: str = '127.0.0.1', port: int = 8053):
+    """Start serving `cache` in a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server.daemon_threads = True
+    server.cache = cache
+
+    thread = threading.Thread(
+        target=server.serve_forever,
+        name='tipdyndns-status',
+        daemon=True,
+    )
+    thread.start()
+
+    log.info(f"Serving status on http://{host}:{server.server_port}/status")
+    return server
@@ -0,0 +1,79 @@
+"""Adaptive TTL policy.
+
+Records get a low TTL right after an IP change (or when a change is due
+according to the history) and a progressively higher TTL while the address
+stays stable. New values are only written when they differ enough from the
+current one (hysteresis), to avoid churn.
+"""
+from typing import List, Optional
+import math
+from datetime import datetime
+
+DEFAULT_TTL_SETTINGS = {
+    'adaptive': False,
+    # Bounds for the TTL, in seconds.
+    'min': 300,
+    'max': 86400,
+    # TTL as a fraction of the time the address has been stable.
+    'fraction': 0.1,
+    # Only write a new TTL if it differs at least this much (relative).
+    'hysteresis': 0.5,
+}
+
+
+def get_ttl_settings(cfg) -> dict:
+    """Return the TTL settings, completed with the defaults."""
+    settings = dict(DEFAULT_TTL_SETTINGS)
+    settings.update(cfg.settings.get('ttl', None) or {})
+    return settings
+
+
+def mean_change_interval(change_times: List[datetime]) -> Optional[float]:
+    """Return the mean number of seconds between IP changes (or None)."""
+    if len(change_times) < 2:
+        return None
+
+    change_times = sorted(change_times)
+    total = (change_times[-1] - change_times[0]).total_seconds()
+    return total / (len(change_times) - 1)
+
+
+def target_ttl(settings: dict, change_times: List[datetime], now: datetime = None) -> int:
+    """Return the TTL the records should have given the change history.
+
+    The TTL grows with the time the address has been stable. If the history
+    shows a typical interval between changes, the TTL is scaled down by how
+    likely a change is: a smooth bump that is 1 at the mean interval and
+    fades out on either side (width: half the mean). The result moves
+    gradually towards `min` as a change becomes due and back up afterwards,
+    without steps.
+    """
+    lo, hi = settings['min'], settings['max']
+
+    if not change_times:
+        return lo
+
+    if now is None:
+        now = datetime.now()
+
+    stable_for = max((now - max(change_times)).total_seconds(), 0)
+    ttl = settings['fraction'] * stable_for
+
+    mean = mean_change_interval(change_times)
+    if mean:
+        likelihood = math.exp(-((stable_for - mean) / (mean / 2)) ** 2)
+        ttl *= 1 - likelihood
+
+    return int(min(max(ttl, lo), hi))
+
+
+def crosses_threshold(settings: dict, current: int, target: int) -> bool:
+    """Return True if changing `current` to `target` is worth a write."""
+    if not current:
+        return True
+
+    # Always allow reaching the bounds themselves.
+    if target != current and target in (settings['min'], settings['max']):
+        return True
+
+    return abs(target - current) / current >= settings['hysteresis']
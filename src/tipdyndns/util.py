@@ -1,5 +1,10 @@
 from typing import Any
 import os
+import copy
+import json
+import queue
+import atexit
+from datetime import datetime
 
 import logging, logging.handlers
 from rich.logging import RichHandler
@@ -17,6 +22,12 @@ from .config import Configuration
 
 log = logging.getLogger('util')
 
+# Filename returned by the first (and only effective) call to setup_logging.
+_log_filename = None
+
+# Listener doing the actual I/O when logging.use_queue is set.
+_queue_listener = None
+
 def get_package_dir():
     return os.path.dirname(__file__)
 
@@ -49,20 +60,93 @@ def get_config(filename="config.yaml"):
 
     return cfg
 
+class JSONFormatter(logging.Formatter):
+    """Format records as compact JSON lines.
+
+    Timestamps are ISO 8601 with milliseconds and the local UTC offset.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'name': record.name,
+            'msg': record.getMessage(),
+        }
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, separators=(',', ':'))
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a queue within this process.
+
+    The default `prepare` formats the traceback into the message and drops
+    `exc_info` so records can be pickled. The records here never leave the
+    process, so only the arguments are merged into the message and the
+    exception info is kept for the handlers (e.g. JSONFormatter) to format.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Only let through every `rate`-th repetition of a message.
+
+    Applies to records at or below `level`; a record counts as a repetition
+    if it has the same logger, level and message template as the previous
+    one. Anything else resets the count.
+    """
+
+    def __init__(self, rate, level=logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+        self._last = None
+        self._count = 0
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+
+        key = (record.name, record.levelno, record.msg, record.args)
+
+        if key != self._last:
+            self._last = key
+            self._count = 0
+
+        self._count += 1
+        return (self._count - 1) % self.rate == 0
+
+
 def setup_logging(cfg: Configuration):
     """Setup a basic logging mechanism.
 
     @type  config: dict
     @param config: dict instance with the following keys in section
-      C{logging}: C{loglevel}, C{logfile}, C{format}, C{max_size}, C{backup_count}
-      and C{use_console}.
+      C{logging}: C{loglevel}, C{logfile}, C{format}, C{max_size}, C{backup_count},
+      C{use_console}, C{use_queue}, C{use_json}, C{sample_rate} and
+      C{sample_level}.
+
+    Handlers are only created on the first call; subsequent calls return the
+    filename that was configured then.
     """
+    global _log_filename, _queue_listener
+
     # Create the root logger
     logger = logging.getLogger()
 
+    if _log_filename is not None:
+        return _log_filename
+
     if logger.handlers:
-        msg = "Logging handlers have already been configured. Skipping setup."
-        logger.warn(msg)
+        log.debug("Logging handlers have already been configured. Skipping setup.")
         return
 
     log_cfg = cfg.settings["logging"]
@@ -80,6 +164,8 @@ def setup_logging(cfg: Configuration):
     datefmt = log_cfg.get("datefmt", "%H:%M:%S")
     bytes_ = log_cfg.get("max_size", 1024)
     backup_count = log_cfg.get("backup_count", 5)
+    sample_rate = log_cfg.get("sample_rate", 1)
+    sample_level = getattr(logging, log_cfg.get("sample_level", "info").upper())
 
     # Make sure the directory exists
     if os.path.isabs(filename):
@@ -92,6 +178,8 @@ def setup_logging(cfg: Configuration):
 
     filename = os.path.join(logdir, filename)
 
+    handlers = []
+
     # Create RotatingFileHandler
     rfh = logging.handlers.RotatingFileHandler(
         filename,
@@ -99,8 +187,13 @@ def setup_logging(cfg: Configuration):
         backupCount=backup_count
     )
     rfh.setLevel(level)
-    rfh.setFormatter(logging.Formatter(format_))
-    logger.addHandler(rfh)
+
+    if log_cfg.get("use_json", False):
+        rfh.setFormatter(JSONFormatter())
+    else:
+        rfh.setFormatter(logging.Formatter(format_))
+
+    handlers.append(rfh)
 
     # Check what to do with the console output ...
     if log_cfg["use_console"]:
@@ -112,16 +205,70 @@ def setup_logging(cfg: Configuration):
             log_time_format=datefmt,
         )
 
-        logger.addHandler(ch)
+        handlers.append(ch)
+
+    if log_cfg.get("use_queue", False):
+        # Do the actual (file/console) I/O on a separate thread.
+        q = queue.SimpleQueue()
+        qh = LocalQueueHandler(q)
+        _queue_listener = logging.handlers.QueueListener(
+            q,
+            *handlers,
+            respect_handler_level=True
+        )
+        _queue_listener.start()
+        atexit.register(stop_queue_listener)
+        handlers = [qh]
+
+    for handler in handlers:
+        if sample_rate > 1:
+            handler.addFilter(SamplingFilter(sample_rate, sample_level))
+
+        logger.addHandler(handler)
 
     # Disable
     logging.getLogger('urllib3').setLevel(logging.ERROR)
     # Finally, capture all warnings using the logging mechanism.
     logging.captureWarnings(True)
 
+    _log_filename = filename
     return filename
 
 
+class LazyNamespace(dict):
+    """Dictionary that creates some of its values on first access.
+
+    `factories` maps keys to callables; a key's value is computed (once) the
+    first time it is looked up and not already present.
+    """
+
+    def __init__(self, *args, factories=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.factories = factories or {}
+
+    def __missing__(self, key):
+        try:
+            factory = self.factories.pop(key)
+        except KeyError:
+            raise KeyError(key)
+
+        value = self[key] = factory()
+        return value
+
+    def names(self):
+        """Return both the available and the not-yet-created keys."""
+        return list(self.keys()) + list(self.factories.keys())
+
+
+def stop_queue_listener():
+    """Flush queued log records and stop the listener thread (if any)."""
+    global _queue_listener
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
 def log_app_header(name):
     """Write application header to the log."""
     log = logging.getLogger()
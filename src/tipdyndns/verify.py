@@ -0,0 +1,160 @@
+"""Post-update propagation verification.
+
+After the records have been updated at TransIP, the authoritative nameservers
+(or the resolvers configured under `verify.nameservers`) are polled
+concurrently until they serve the new address or the deadline passes.
+"""
+from typing import List, Dict, Optional
+import time
+import asyncio
+import logging
+import ipaddress
+
+import dns.asyncquery
+import dns.asyncresolver
+import dns.exception
+import dns.message
+import dns.rdatatype
+
+log = logging.getLogger('tipdyndns')
+
+DEFAULT_VERIFY_SETTINGS = {
+    'enabled': False,
+    # Empty means: use the authoritative nameservers for each domain.
+    'nameservers': [],
+    'port': 53,
+    # Overall deadline and poll interval, in seconds.
+    'timeout': 120,
+    'interval': 2,
+}
+
+
+def get_verify_settings(cfg) -> dict:
+    """Return the verification settings, completed with the defaults."""
+    settings = dict(DEFAULT_VERIFY_SETTINGS)
+    settings.update(cfg.settings.get('verify', None) or {})
+    return settings
+
+
+async def _resolve_addresses(name: str) -> List[str]:
+    """Return the IPv4 addresses for `name` (which may be an address)."""
+    try:
+        ipaddress.ip_address(name)
+        return [name]
+    except ValueError:
+        pass
+
+    answer = await dns.asyncresolver.resolve(name, 'A')
+    return [r.address for r in answer]
+
+
+async def _authoritative_nameservers(domain: str) -> List[str]:
+    """Return the addresses of the authoritative nameservers for `domain`."""
+    answer = await dns.asyncresolver.resolve(domain, 'NS')
+    names = [r.target.to_text() for r in answer]
+    addresses = await asyncio.gather(*[_resolve_addresses(n) for n in names])
+    return [a for addrs in addresses for a in addrs]
+
+
+async def _query_a(host: str, nameserver: str, port: int, timeout: float) -> List[str]:
+    """Send a single, non-blocking A query for `host` to `nameserver`."""
+    query = dns.message.make_query(host, dns.rdatatype.A)
+    response = await dns.asyncquery.udp(query, nameserver, timeout=timeout, port=port)
+
+    return [
+        rdata.address
+        for rrset in response.answer if rrset.rdtype == dns.rdatatype.A
+        for rdata in rrset
+    ]
+
+
+async def _wait_for_record(
+    host: str, nameserver: str, port: int, expected: str,
+    started: float, deadline: float, interval: float
+) -> Optional[float]:
+    """Poll `nameserver` until it serves `expected` for `host`.
+
+    Returns the number of seconds since `started` or None if the deadline
+    passed first.
+    """
+    while True:
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            return None
+
+        try:
+            addresses = await _query_a(host, nameserver, port, min(remaining, 5))
+
+            if expected in addresses:
+                return time.monotonic() - started
+
+        except (dns.exception.DNSException, OSError) as e:
+            log.debug(f"Query for '{host}' at {nameserver} failed: {e}")
+
+        await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+
+async def verify_propagation_async(
+    hosts: List[str], expected: str, nameservers: List[str] = None,
+    port: int = 53, timeout: float = 120, interval: float = 2
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """Check all `hosts` on all nameservers concurrently.
+
+    Returns a dict {host: {nameserver: seconds_until_converged or None}}.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+
+    if nameservers:
+        addresses = await asyncio.gather(*[_resolve_addresses(n) for n in nameservers])
+        configured = [a for addrs in addresses for a in addrs]
+
+    # Look up the authoritative nameservers once per domain.
+    authoritative = {}
+    targets = {}
+    for host in hosts:
+        if nameservers:
+            targets[host] = configured
+        else:
+            domain = host.split('.', 1)[1]
+            if domain not in authoritative:
+                authoritative[domain] = await _authoritative_nameservers(domain)
+            targets[host] = authoritative[domain]
+
+    jobs = [
+        (host, ns)
+        for host in hosts
+        for ns in targets[host]
+    ]
+
+    results = await asyncio.gather(*[
+        _wait_for_record(host, ns, port, expected, started, deadline, interval)
+        for host, ns in jobs
+    ])
+
+    converged = {host: {} for host in hosts}
+    for (host, ns), seconds in zip(jobs, results):
+        converged[host][ns] = seconds
+
+    return converged
+
+
+def verify_propagation(cfg, hosts: List[str], expected: str, **overrides):
+    """Verify that `hosts` resolve to `expected` using the configured settings.
+
+    Keyword arguments override the settings from `cfg`.
+    """
+    settings = get_verify_settings(cfg)
+    settings.update(overrides)
+
+    log.info(f"Verifying propagation of '{expected}' for {len(hosts)} host(s)")
+
+    return asyncio.run(verify_propagation_async(
+        hosts,
+        expected,
+        nameservers=settings['nameservers'],
+        port=settings['port'],
+        timeout=settings['timeout'],
+        interval=settings['interval'],
+    ))
@@ -0,0 +1,14 @@
+"""Shared fixtures."""
+import pytest
+
+
+@pytest.fixture
+def app_dirs(tmp_path, monkeypatch):
+    """Keep the application's config, cache and data dirs inside tmp_path."""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'config'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    (tmp_path / 'data' / 'tipdyndns').mkdir(parents=True)
+
+    return tmp_path
@@ -0,0 +1,115 @@
+"""Tests for configuration loading and its cache."""
+import os
+import stat
+
+import pytest
+
+from tipdyndns import config
+
+
+@pytest.fixture
+def cfg(app_dirs):
+    return config.Configuration('tipdyndns')
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    filename = tmp_path / 'config.yaml'
+    filename.write_text(
+        "logging:\n"
+        "  level: INFO\n"
+        "transip:\n"
+        "  privkey: secret\n"
+        "hosts:\n"
+        "  - www.example.com\n"
+    )
+    return str(filename)
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count the number of times YAML is parsed."""
+    calls = []
+    load = config.yaml.load
+
+    def counting_load(*args, **kwargs):
+        calls.append(1)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(config.yaml, 'load', counting_load)
+    return calls
+
+
+def test_deep_merge():
+    base = {'a': {'b': 1, 'c': 2}, 'd': [1]}
+    merged = config.deep_merge(base, {'a': {'c': 3}, 'd': [2], 'e': 4})
+
+    assert merged == {'a': {'b': 1, 'c': 3}, 'd': [2], 'e': 4}
+    assert base == {'a': {'b': 1, 'c': 2}, 'd': [1]}
+
+
+def test_load_merges_defaults(cfg, config_file):
+    cfg.load(config_file)
+
+    assert cfg.settings.logging.level == 'INFO'
+    assert cfg.settings.logging.use_console is True
+    assert cfg.settings.hosts == ['www.example.com']
+
+
+def test_cache_is_used(cfg, config_file, parses):
+    cfg.load(config_file)
+    config.Configuration('tipdyndns').load(config_file)
+
+    assert len(parses) == 1
+
+
+def test_cache_invalidated_on_change(cfg, config_file, parses):
+    cfg.load(config_file)
+
+    with open(config_file, 'a') as fp:
+        fp.write("expire: 300\n")
+
+    other = config.Configuration('tipdyndns')
+    other.load(config_file)
+
+    assert len(parses) == 2
+    assert other.settings.expire == 300
+
+
+def test_cache_per_file(cfg, config_file, tmp_path, parses):
+    other_file = tmp_path / 'other.yaml'
+    other_file.write_text("expire: 300\n")
+
+    # Alternating between two files parses each of them only once.
+    for filename in [config_file, str(other_file)] * 2:
+        config.Configuration('tipdyndns').load(filename)
+
+    assert len(parses) == 2
+    assert cfg.cache_file(config_file) != cfg.cache_file(str(other_file))
+
+
+def test_cache_is_private(cfg, config_file):
+    cfg.load(config_file)
+    mode = stat.S_IMODE(os.stat(cfg.cache_file(config_file)).st_mode)
+
+    assert mode == 0o600
+
+
+def test_corrupt_cache_is_ignored(cfg, config_file, parses):
+    os.makedirs(cfg.cache_dir)
+    with open(cfg.cache_file(config_file), 'w') as fp:
+        fp.write('not json')
+
+    cfg.load(config_file)
+
+    assert len(parses) == 1
+    assert cfg.settings.transip.privkey == 'secret'
+
+
+def test_incompatible_config_not_cached(cfg, tmp_path):
+    filename = tmp_path / 'dates.yaml'
+    filename.write_text("started: 2026-01-01\n")
+
+    cfg.load(str(filename))
+
+    assert not os.path.exists(cfg.cache_file(str(filename)))
@@ -0,0 +1,58 @@
+"""Tests for the IP history database."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tipdyndns import config
+from tipdyndns import main
+
+
+@pytest.fixture
+def cfg(app_dirs):
+    cfg = config.Configuration('tipdyndns')
+    cfg.settings.database = 'test.db'
+    return cfg
+
+
+def test_history(cfg):
+    db = main.Database(cfg)
+    assert main.get_last_ip(db) == ''
+
+    db.add_entry('1.2.3.4')
+    db.add_entry('5.6.7.8')
+
+    assert main.get_last_ip(db) == '5.6.7.8'
+    assert [ip for ip, _ in db.get_history()] == ['5.6.7.8', '1.2.3.4']
+    db.close()
+
+
+def test_snapshot_of_missing_database(cfg):
+    db = main.Database(cfg, snapshot=True)
+
+    assert db.get_entries() == []
+    assert not os.path.exists(os.path.join(cfg.data_dir, 'test.db'))
+    db.close()
+
+
+def test_snapshot_does_not_lock(cfg):
+    db = main.Database(cfg)
+    db.add_entry('1.2.3.4')
+    db.close()
+
+    snapshot = main.Database(cfg, snapshot=True)
+    assert main.get_last_ip(snapshot) == '1.2.3.4'
+
+    # Another process can still open the real database read-write.
+    filename = os.path.join(cfg.data_dir, 'test.db')
+    code = (
+        "import duckdb, sys\n"
+        "conn = duckdb.connect(sys.argv[1])\n"
+        "conn.sql(\"insert into ip_history values (99, '5.6.7.8', now())\")\n"
+    )
+    subprocess.run([sys.executable, '-c', code, filename], check=True)
+
+    # The snapshot doesn't see later changes.
+    assert main.get_last_ip(snapshot) == '1.2.3.4'
+    snapshot.close()
@@ -0,0 +1,84 @@
+"""Tests for the run modes."""
+import time
+
+import pytest
+
+from tipdyndns import config
+from tipdyndns import main
+from tipdyndns.providers import MemoryProvider, Record
+
+# Duration of each slow step.
+STEP = 0.5
+
+
+@pytest.fixture
+def cfg(app_dirs):
+    cfg = config.Configuration('tipdyndns')
+    cfg.settings.update(
+        database='test.db',
+        expire=3600,
+        hosts=['www.example.com'],
+    )
+    return cfg
+
+
+@pytest.fixture
+def provider(cfg, monkeypatch):
+    provider = MemoryProvider()
+    provider.domains['example.com'] = [Record('www', 3600, 'A', '1.2.3.4')]
+
+    def get_current_ip(cfg):
+        time.sleep(STEP)
+        return '5.6.7.8'
+
+    def get_provider(cfg):
+        time.sleep(STEP)
+        return provider
+
+    monkeypatch.setattr(main, 'get_current_ip', get_current_ip)
+    monkeypatch.setattr(main, 'get_provider', get_provider)
+    return provider
+
+
+def last_ip(cfg):
+    db = main.Database(cfg)
+    try:
+        return main.get_last_ip(db)
+    finally:
+        db.close()
+
+
+def timed(fn, *args):
+    started = time.monotonic()
+    fn(*args)
+    return time.monotonic() - started
+
+
+def test_run_changed(cfg, provider):
+    # Sequential: IP lookup, then the provider.
+    assert timed(main.run, cfg, False) >= 2 * STEP
+    assert provider.domains['example.com'] == [Record('www', 3600, 'A', '5.6.7.8')]
+    assert last_ip(cfg) == '5.6.7.8'
+
+
+def test_run_pipelined_changed(cfg, provider):
+    # Overlapped: roughly the longest single step.
+    assert timed(main.run_pipelined, cfg, False) < 1.5 * STEP
+    assert provider.domains['example.com'] == [Record('www', 3600, 'A', '5.6.7.8')]
+    assert last_ip(cfg) == '5.6.7.8'
+
+
+def test_run_pipelined_unchanged(cfg, provider, monkeypatch):
+    db = main.Database(cfg)
+    db.add_entry('5.6.7.8')
+    db.close()
+
+    def get_provider(cfg):
+        time.sleep(10 * STEP)
+        return provider
+
+    monkeypatch.setattr(main, 'get_provider', get_provider)
+
+    # Returns after the IP lookup, without waiting for the provider.
+    assert timed(main.run_pipelined, cfg, False) < 1.5 * STEP
+    assert provider.calls == {}
@@ -0,0 +1,162 @@
+"""Tests for the DNS provider backends."""
+from collections import Counter
+
+import pytest
+
+from tipdyndns import config
+from tipdyndns.providers import Provider, MemoryProvider, Record, get_provider
+
+DOMAIN = 'example.com'
+
+
+def make_provider(**flags):
+    provider = MemoryProvider(**flags)
+    provider.domains[DOMAIN] = [
+        Record('www', 3600, 'A', '1.1.1.1'),
+        Record('mail', 3600, 'A', '1.1.1.1'),
+        Record('@', 3600, 'MX', '10 mail.example.com.'),
+    ]
+    return provider
+
+
+def apply(provider, creates=(), updates=()):
+    """Apply the changes and return the operations that were called."""
+    existing = provider.list(DOMAIN)
+    provider.calls.clear()
+    provider.apply(DOMAIN, existing, list(creates), list(updates))
+    return provider.calls
+
+
+def records(provider):
+    return sorted(provider.domains[DOMAIN])
+
+
+def content(name, ip='2.2.2.2', expire=3600):
+    return Record(name, expire, 'A', ip)
+
+
+def test_provider_is_abstract():
+    with pytest.raises(TypeError):
+        Provider()
+
+
+def test_nothing_to_do():
+    assert apply(make_provider()) == Counter()
+
+
+def test_single_update():
+    provider = make_provider()
+
+    assert apply(provider, updates=[content('www')]) == Counter(update=1)
+    assert content('www') in records(provider)
+
+
+@pytest.mark.parametrize('supports_bulk_replace', [False, True])
+def test_updates_batched(supports_bulk_replace):
+    provider = make_provider(supports_batch=True, supports_bulk_replace=supports_bulk_replace)
+    calls = apply(provider, updates=[content('www'), content('mail')])
+
+    assert calls == Counter(update_many=1)
+    assert content('www') in records(provider)
+    assert content('mail') in records(provider)
+
+
+@pytest.mark.parametrize('allow_replace', [False, True])
+def test_updates_without_batch(allow_replace):
+    provider = make_provider(
+        supports_batch=False,
+        supports_bulk_replace=True,
+        allow_replace=allow_replace,
+    )
+    calls = apply(provider, updates=[content('www'), content('mail')])
+
+    # Content changes never rewrite the whole zone.
+    assert calls == Counter(update=2)
+
+
+def test_creates_and_updates():
+    provider = make_provider(supports_batch=False, supports_bulk_replace=True)
+    calls = apply(provider, creates=[content('vpn')], updates=[content('www')])
+
+    assert calls == Counter(create=1, update=1)
+    assert content('vpn') in records(provider)
+
+
+def test_expire_updated_in_place():
+    provider = make_provider(updates_expire=True)
+    calls = apply(provider, updates=[content('www', expire=300)])
+
+    assert calls == Counter(update=1)
+
+
+def test_expire_by_create_and_delete():
+    provider = make_provider(updates_expire=False, supports_bulk_replace=True)
+    calls = apply(provider, updates=[content('www', expire=300), content('mail')])
+
+    assert calls == Counter(create=1, delete=1, update=1)
+    assert records(provider) == sorted([
+        content('www', expire=300),
+        content('mail'),
+        Record('@', 3600, 'MX', '10 mail.example.com.'),
+    ])
+
+
+def test_expire_by_replace_when_allowed():
+    provider = make_provider(
+        updates_expire=False,
+        supports_bulk_replace=True,
+        allow_replace=True,
+    )
+    calls = apply(
+        provider,
+        creates=[content('vpn')],
+        updates=[content('www', expire=300), content('mail')],
+    )
+
+    assert calls == Counter(replace_all=1)
+    assert records(provider) == sorted([
+        content('www', expire=300),
+        content('mail'),
+        content('vpn'),
+        Record('@', 3600, 'MX', '10 mail.example.com.'),
+    ])
+
+
+def test_expire_replace_needs_capability():
+    provider = make_provider(
+        updates_expire=False,
+        supports_bulk_replace=False,
+        allow_replace=True,
+    )
+    calls = apply(provider, updates=[content('www', expire=300)])
+
+    assert calls == Counter(create=1, delete=1)
+
+
+@pytest.fixture
+def memory_cfg(app_dirs, monkeypatch):
+    monkeypatch.setattr(MemoryProvider, 'shared', None)
+
+    cfg = config.Configuration('tipdyndns')
+    cfg.settings.provider = {
+        'name': 'memory',
+        'updates_expire': False,
+        'records': {
+            DOMAIN: [{'name': 'www', 'expire': 3600, 'type': 'A', 'content': '1.1.1.1'}],
+        },
+    }
+    return cfg
+
+
+def test_memory_provider_from_config(memory_cfg):
+    provider = get_provider(memory_cfg)
+
+    assert provider.updates_expire is False
+    assert provider.list(DOMAIN) == [Record('www', 3600, 'A', '1.1.1.1')]
+
+
+def test_memory_provider_shared(memory_cfg):
+    get_provider(memory_cfg).create(DOMAIN, content('vpn'))
+
+    # A later check sees the records written by an earlier one.
+    assert content('vpn') in get_provider(memory_cfg).list(DOMAIN)
@@ -0,0 +1,97 @@
+"""Tests for the HTTP status endpoint."""
+from datetime import datetime
+import urllib.request
+import urllib.error
+
+import pytest
+
+from tipdyndns import server
+
+
+@pytest.fixture
+def cache():
+    cache = server.StatusCache()
+    cache.update(
+        ip='1.2.3.4',
+        changed_dt=datetime(2026, 1, 1, 12, 0),
+        hosts={'www.example.com': {'content': '1.2.3.4'}},
+        history=[('1.2.3.4', datetime(2026, 1, 1, 12, 0))],
+    )
+    return cache
+
+
+@pytest.fixture
+def url(cache):
+    httpd = server.serve(cache, '127.0.0.1', 0)
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url, **headers):
+    request = urllib.request.Request(url, headers=headers)
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_etag_changes_with_content(cache):
+    _, etag, _ = cache.get('/status')
+    cache.update(ip='1.2.3.4')
+    assert cache.get('/status')[1] == etag
+
+    cache.update(ip='5.6.7.8')
+    assert cache.get('/status')[1] != etag
+
+
+def test_status(url):
+    status, headers, body = get(url + '/status')
+
+    assert status == 200
+    assert headers['Content-Type'] == 'application/json'
+    assert b'"ip": "1.2.3.4"' in body
+    assert headers['ETag']
+
+
+def test_ip(url):
+    status, _, body = get(url + '/ip')
+
+    assert status == 200
+    assert body == b'1.2.3.4'
+
+
+def test_unknown_path(url):
+    status, _, _ = get(url + '/nope')
+    assert status == 404
+
+
+@pytest.mark.parametrize('if_none_match', [
+    '{etag}',
+    'W/{etag}',
+    '"something-else", {etag}',
+    '*',
+])
+def test_if_none_match(url, if_none_match):
+    _, headers, _ = get(url + '/status')
+    etag = headers['ETag']
+
+    status, headers, body = get(url + '/status', **{
+        'If-None-Match': if_none_match.format(etag=etag)
+    })
+
+    assert status == 304
+    assert headers['ETag'] == etag
+    assert body == b''
+
+
+def test_if_none_match_stale(url, cache):
+    _, headers, _ = get(url + '/status')
+    cache.update(ip='5.6.7.8')
+
+    status, _, body = get(url + '/status', **{'If-None-Match': headers['ETag']})
+
+    assert status == 200
+    assert b'5.6.7.8' in body
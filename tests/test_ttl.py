@@ -0,0 +1,201 @@
+"""Tests for the adaptive TTL policy."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from tipdyndns import config
+from tipdyndns import main
+from tipdyndns import server
+from tipdyndns import ttl
+from tipdyndns.providers import MemoryProvider, Record
+
+NOW = datetime(2026, 1, 1)
+DAY = timedelta(days=1)
+
+
+@pytest.fixture
+def settings():
+    return dict(ttl.DEFAULT_TTL_SETTINGS)
+
+
+def test_mean_change_interval():
+    assert ttl.mean_change_interval([]) is None
+    assert ttl.mean_change_interval([NOW]) is None
+    assert ttl.mean_change_interval([NOW, NOW - 2 * DAY, NOW - 4 * DAY]) == 2 * DAY.total_seconds()
+
+
+def test_target_without_history(settings):
+    assert ttl.target_ttl(settings, [], NOW) == settings['min']
+
+
+def test_target_just_changed(settings):
+    assert ttl.target_ttl(settings, [NOW], NOW) == settings['min']
+
+
+def test_target_grows_while_stable(settings):
+    # A single change: no mean interval, TTL is a fraction of the stable time.
+    hour = timedelta(hours=1)
+    assert ttl.target_ttl(settings, [NOW - 10 * hour], NOW) == 3600
+    assert ttl.target_ttl(settings, [NOW - 20 * hour], NOW) == 7200
+    assert ttl.target_ttl(settings, [NOW - 100 * DAY], NOW) == settings['max']
+
+
+def test_target_low_when_change_is_due(settings):
+    settings['max'] = 10 ** 9
+    changes = [NOW - 40 * DAY, NOW - 30 * DAY, NOW - 20 * DAY]
+
+    # 20 days stable, mean interval 10 days: long past due.
+    far = ttl.target_ttl(settings, changes, NOW)
+
+    # Exactly at the mean interval: a change is most likely.
+    due = ttl.target_ttl(settings, changes, NOW - 10 * DAY)
+
+    assert due == settings['min']
+    assert far > due
+
+
+def test_target_has_no_steps(settings):
+    settings['max'] = 10 ** 9
+    mean = 10 * DAY
+    last = NOW - 20 * DAY
+    changes = [last - 2 * mean, last - mean, last]
+
+    step = timedelta(hours=1)
+    values = [
+        ttl.target_ttl(settings, changes, last + i * step)
+        for i in range(24 * 40)
+    ]
+
+    # An hour adds at most fraction * 3600 (plus the bump's slope) to the TTL.
+    jumps = [abs(b - a) for a, b in zip(values, values[1:])]
+    assert max(jumps) < 3 * settings['fraction'] * 3600
+
+
+def test_target_clamped(settings):
+    changes = [NOW - 1000 * DAY, NOW - 1001 * DAY]
+    assert settings['min'] <= ttl.target_ttl(settings, changes, NOW) <= settings['max']
+
+
+@pytest.mark.parametrize('current, target, expected', [
+    (None, 300, True),
+    (300, 300, False),
+    (300, 400, False),
+    (300, 450, True),
+    (3600, 2000, False),
+    (3600, 1000, True),
+    (80000, 86400, True),
+    (600, 300, True),
+])
+def test_crosses_threshold(settings, current, target, expected):
+    assert ttl.crosses_threshold(settings, current, target) is expected
+
+
+# ------------------------------------------------------------------------------
+# adjust_ttl
+# ------------------------------------------------------------------------------
+class StopWatch(Exception):
+    pass
+
+
+@pytest.fixture
+def cfg(app_dirs):
+    cfg = config.Configuration('tipdyndns')
+    cfg.settings.update(
+        database='test.db',
+        expire=3600,
+        hosts=['www.example.com', 'mail.example.com'],
+        ttl={'adaptive': True},
+    )
+    return cfg
+
+
+@pytest.fixture
+def db(cfg):
+    db = main.Database(cfg)
+
+    # Stable for 10 days: the target is ttl.max.
+    db.add_entry('1.2.3.4', datetime.now() - 10 * DAY)
+    for host in cfg.settings.hosts:
+        db.set_ttl(host, 300)
+
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def provider():
+    provider = MemoryProvider(updates_expire=False)
+    provider.domains['example.com'] = [
+        Record('www', 300, 'A', '1.2.3.4'),
+        Record('mail', 300, 'A', '1.2.3.4'),
+        Record('@', 3600, 'MX', '10 mail.example.com.'),
+    ]
+    return provider
+
+
+def factory(provider):
+    """Return a provider factory that counts its calls."""
+    calls = []
+
+    def provider_factory():
+        calls.append(1)
+        return provider
+
+    return provider_factory, calls
+
+
+def test_adjust_ttl(cfg, db, provider):
+    provider_factory, calls = factory(provider)
+    hosts = main.adjust_ttl(cfg, db, provider_factory)
+
+    assert calls == [1]
+    assert provider.calls['create'] == 2
+    assert provider.calls['delete'] == 2
+    assert sorted(provider.domains['example.com']) == sorted([
+        Record('www', 86400, 'A', '1.2.3.4'),
+        Record('mail', 86400, 'A', '1.2.3.4'),
+        Record('@', 3600, 'MX', '10 mail.example.com.'),
+    ])
+
+    assert db.get_ttl('www.example.com') == 86400
+    assert hosts['www.example.com']['expire'] == 86400
+    assert hosts['www.example.com']['content'] == '1.2.3.4'
+
+    # Nothing crosses the threshold anymore: the provider isn't needed.
+    assert main.adjust_ttl(cfg, db, provider_factory) == {}
+    assert calls == [1]
+
+
+def test_adjust_ttl_in_place(cfg, db, provider):
+    provider.updates_expire = True
+    provider_factory, _ = factory(provider)
+    main.adjust_ttl(cfg, db, provider_factory)
+
+    assert provider.calls['update_many'] == 1
+    assert 'delete' not in provider.calls
+
+
+def test_adjust_ttl_disabled(cfg, db, provider):
+    cfg.settings.ttl['adaptive'] = False
+    provider_factory, calls = factory(provider)
+
+    assert main.adjust_ttl(cfg, db, provider_factory) == {}
+    assert calls == []
+
+
+def test_watch_reports_new_ttl(cfg, db, provider, monkeypatch):
+    db.close()
+    cache = server.StatusCache()
+
+    def sleep(seconds):
+        raise StopWatch()
+
+    monkeypatch.setattr(main, 'get_current_ip', lambda cfg: '1.2.3.4')
+    monkeypatch.setattr(main, 'get_provider', lambda cfg: provider)
+    monkeypatch.setattr(main.time, 'sleep', sleep)
+
+    with pytest.raises(StopWatch):
+        main.watch(cfg, status_cache=cache)
+
+    assert cache.hosts['www.example.com']['expire'] == 86400
+    assert cache.hosts['mail.example.com']['expire'] == 86400
@@ -0,0 +1,127 @@
+"""Tests for the logging setup."""
+import re
+import json
+import logging
+from datetime import datetime
+
+import pytest
+
+from tipdyndns import config
+from tipdyndns import util
+
+
+def make_record(msg, level=logging.INFO, name='tipdyndns', args=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+@pytest.fixture
+def root_logger():
+    """Restore the root logger and setup_logging's state afterwards."""
+    logger = logging.getLogger()
+    handlers, level = logger.handlers[:], logger.level
+    logger.handlers = []
+
+    yield logger
+
+    util.stop_queue_listener()
+
+    for handler in logger.handlers:
+        handler.close()
+
+    logger.handlers, logger.level = handlers, level
+    util._log_filename = None
+
+
+def setup_logging(logger, cfg):
+    # pytest attaches its capture handlers to the root logger per test.
+    logger.handlers = []
+    return util.setup_logging(cfg)
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    cfg = config.Configuration('tipdyndns')
+    cfg.settings.logging.update(
+        file=str(tmp_path / 'test.log'),
+        use_console=False,
+        use_json=True,
+    )
+    return cfg
+
+
+def test_sampling_filter_passes_every_nth_repetition():
+    f = util.SamplingFilter(3)
+    passed = [f.filter(make_record("IP unchanged: '1.2.3.4'")) for _ in range(7)]
+
+    assert passed == [True, False, False, True, False, False, True]
+
+
+def test_sampling_filter_resets_on_other_message():
+    f = util.SamplingFilter(3)
+
+    assert f.filter(make_record('a'))
+    assert not f.filter(make_record('a'))
+    assert f.filter(make_record('b'))
+    assert f.filter(make_record('a'))
+
+
+def test_sampling_filter_distinguishes_args():
+    f = util.SamplingFilter(3)
+
+    assert f.filter(make_record('IP: %s', args=('1.2.3.4',)))
+    assert f.filter(make_record('IP: %s', args=('5.6.7.8',)))
+
+
+def test_sampling_filter_ignores_higher_levels():
+    f = util.SamplingFilter(3, level=logging.INFO)
+    records = [make_record('boom', level=logging.WARNING) for _ in range(3)]
+
+    assert all(f.filter(r) for r in records)
+
+
+def test_json_formatter():
+    line = util.JSONFormatter().format(make_record('IP: %s', args=('1.2.3.4',)))
+    entry = json.loads(line)
+
+    assert entry['msg'] == 'IP: 1.2.3.4'
+    assert entry['level'] == 'INFO'
+    assert entry['name'] == 'tipdyndns'
+    assert 'exc' not in entry
+
+
+def test_json_formatter_timestamp():
+    record = make_record('hello')
+    entry = json.loads(util.JSONFormatter().format(record))
+    ts = datetime.fromisoformat(entry['ts'])
+
+    assert ts.utcoffset() is not None
+    assert abs(ts.timestamp() - record.created) < 0.001
+    assert re.search(r'\.\d{3}[+-]\d{2}:\d{2}$', entry['ts'])
+
+
+@pytest.mark.parametrize('use_queue', [False, True])
+def test_json_exceptions(root_logger, cfg, use_queue):
+    cfg.settings.logging.use_queue = use_queue
+    filename = setup_logging(root_logger, cfg)
+
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logging.getLogger('tipdyndns').exception('Check failed: %s', 'boom')
+
+    # Flush the queue (no-op without one).
+    util.stop_queue_listener()
+
+    with open(filename) as fp:
+        entry = json.loads(fp.readlines()[-1])
+
+    assert entry['msg'] == 'Check failed: boom'
+    assert 'ValueError: boom' in entry['exc']
+
+
+def test_setup_logging_once(root_logger, cfg):
+    filename = setup_logging(root_logger, cfg)
+    handlers = root_logger.handlers[:]
+
+    assert util.setup_logging(cfg) == filename
+    assert root_logger.handlers == handlers
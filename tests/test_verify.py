@@ -0,0 +1,131 @@
+"""Tests for propagation verification against a local stub DNS server."""
+import socket
+import struct
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from tipdyndns import cli
+
+
+class StubDNSServer(object):
+    """Minimal UDP responder that answers every A query with `self.ip`."""
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+
+            self.queries += 1
+            self.sock.sendto(self.respond(data), addr)
+
+    def respond(self, query):
+        # Header: same id, standard response, 1 question, 1 answer.
+        header = query[:2] + struct.pack('>HHHHH', 0x8180, 1, 1, 0, 0)
+
+        # Question section runs until the end of QNAME + QTYPE + QCLASS.
+        end = query.index(b'\x00', 12) + 5
+        question = query[12:end]
+
+        # Answer: pointer to QNAME, type A, class IN, TTL, RDLENGTH, RDATA.
+        answer = struct.pack('>HHHIH', 0xc00c, 1, 1, 60, 4) + socket.inet_aton(self.ip)
+
+        return header + question + answer
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def stub():
+    server = StubDNSServer('1.2.3.4')
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def config_file(app_dirs):
+    filename = app_dirs / 'config.yaml'
+    filename.write_text(
+        "logging:\n"
+        "  level: NONE\n"
+        "database: test.db\n"
+        "expire: 3600\n"
+        "hosts:\n"
+        "  - www.example.com\n"
+        "  - mail.example.com\n"
+    )
+    return str(filename)
+
+
+def invoke(config_file, *args):
+    return CliRunner().invoke(cli.cli, ['-c', config_file, 'verify', *args])
+
+
+def test_verify_converged(config_file, stub):
+    result = invoke(
+        config_file,
+        '--ip', '1.2.3.4',
+        '--nameserver', '127.0.0.1',
+        '--port', str(stub.port),
+        '--timeout', '5',
+    )
+
+    assert result.exit_code == 0, result.output
+    assert 'www.example.com @ 127.0.0.1: 0.' in result.output
+    assert 'mail.example.com @ 127.0.0.1: 0.' in result.output
+    assert stub.queries == 2
+
+
+def test_verify_settings_from_config(config_file, stub):
+    with open(config_file, 'a') as fp:
+        fp.write(
+            "verify:\n"
+            "  nameservers: ['127.0.0.1']\n"
+            f"  port: {stub.port}\n"
+            "  timeout: 1\n"
+        )
+
+    result = invoke(config_file, '--ip', '1.2.3.4')
+
+    assert result.exit_code == 0, result.output
+    assert 'www.example.com @ 127.0.0.1: 0.' in result.output
+    assert stub.queries == 2
+
+
+def test_verify_timeout(config_file, stub):
+    result = invoke(
+        config_file,
+        '--ip', '5.6.7.8',
+        '--nameserver', '127.0.0.1',
+        '--port', str(stub.port),
+        '--timeout', '1',
+    )
+
+    assert result.exit_code == 0, result.output
+    assert 'www.example.com @ 127.0.0.1: timeout' in result.output
+    assert stub.queries >= 2
+
+
+def test_verify_without_history(config_file, stub):
+    result = invoke(
+        config_file,
+        '--nameserver', '127.0.0.1',
+        '--port', str(stub.port),
+    )
+
+    assert result.exit_code != 0
+    assert 'No known IP address' in result.output
+    assert stub.queries == 0